@@ -1,25 +1,43 @@
 import streamlit as st
-import time
-import threading
-import queue
 from datetime import datetime, timedelta
-import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
+from plotly_resampler import FigureResampler
 
 from vibration_detector import VibrationDetector
 from signal_processor import SignalProcessor
 from data_logger import DataLogger
+from vibration_monitor import VibrationMonitor
+
+@st.cache_resource
+def _shared_logger():
+    """Data logger shared by all sessions, so new tabs don't re-initialize the database"""
+    return DataLogger()
+
+def get_logger():
+    """
+    Get the shared data logger. An in-memory fallback logger isn't kept,
+    so the next session retries the database instead of inheriting the failure.
+    """
+    data_logger = _shared_logger()
+    if not data_logger.use_database:
+        _shared_logger.clear()
+    return data_logger
 
 # Initialize session state
 if 'detector' not in st.session_state:
     st.session_state.detector = VibrationDetector()
     st.session_state.processor = SignalProcessor()
-    st.session_state.logger = DataLogger()
+    st.session_state.logger = get_logger()
+    st.session_state.monitor = VibrationMonitor(
+        st.session_state.detector, st.session_state.processor, st.session_state.logger
+    )
     st.session_state.monitoring = False
-    st.session_state.data_queue = queue.Queue()
-    st.session_state.alert_history = []
+
+# Upper bound on points sent to the browser per trace
+CHART_MAX_POINTS = 800
 
 def main():
     st.set_page_config(
@@ -66,6 +84,12 @@ def main():
         st.session_state.processor.set_filter_enabled(filter_enabled)
         st.session_state.processor.set_smoothing_window(smoothing_window)
         
+        # Store settings once per change instead of on every logged row
+        config = (threshold, sensitivity, filter_enabled, smoothing_window)
+        if st.session_state.get('config') != config:
+            st.session_state.config = config
+            st.session_state.monitor.config_id = st.session_state.logger.add_configuration(*config)
+        
         st.divider()
         
         # Control buttons
@@ -81,7 +105,7 @@ def main():
         # Clear data button
         if st.button("🗑️ Clear History"):
             st.session_state.logger.clear_data()
-            st.session_state.alert_history = []
+            st.session_state.monitor.clear_alerts()
             st.rerun()
     
     # Main dashboard
@@ -91,54 +115,24 @@ def start_monitoring():
     """Start the vibration monitoring system"""
     st.session_state.monitoring = True
     
-    def monitoring_loop():
-        while st.session_state.monitoring:
-            # Generate vibration data
-            raw_data = st.session_state.detector.get_vibration_reading()
-            
-            # Process signal
-            processed_data = st.session_state.processor.process_signal(raw_data)
-            
-            # Check for alerts
-            alert_triggered = st.session_state.detector.check_threshold(processed_data['magnitude'])
-            
-            # Log data
-            log_entry = {
-                'timestamp': datetime.now(),
-                'raw_magnitude': raw_data['magnitude'],
-                'processed_magnitude': processed_data['magnitude'],
-                'x_axis': processed_data['x'],
-                'y_axis': processed_data['y'], 
-                'z_axis': processed_data['z'],
-                'alert': alert_triggered,
-                'threshold_used': st.session_state.detector.threshold,
-                'sensitivity_level': st.session_state.detector.sensitivity,
-                'filter_enabled': st.session_state.processor.filter_enabled
-            }
-            
-            st.session_state.logger.add_entry(log_entry)
-            
-            # Handle alerts
-            if alert_triggered:
-                alert_message = f"⚠️ Vibration Alert: {processed_data['magnitude']:.2f} exceeds threshold {st.session_state.detector.threshold:.2f}"
-                st.session_state.alert_history.append({
-                    'timestamp': datetime.now(),
-                    'message': alert_message,
-                    'magnitude': processed_data['magnitude']
-                })
-            
-            time.sleep(0.5)  # Update every 500ms
-    
-    # Start monitoring in a separate thread
-    monitor_thread = threading.Thread(target=monitoring_loop, daemon=True)
-    monitor_thread.start()
+    # Monitoring runs on a background thread that only writes to the logger and alert history
+    st.session_state.monitor.start()
     st.rerun()
 
 def stop_monitoring():
     """Stop the vibration monitoring system"""
     st.session_state.monitoring = False
+    st.session_state.monitor.stop()
     st.rerun()
 
+def live_fragment(func, interval="1s"):
+    """
+    Wrap a dashboard section in a fragment that re-runs on its own while monitoring,
+    so live updates don't re-execute the whole script
+    """
+    run_every = interval if st.session_state.monitoring else None
+    return st.fragment(run_every=run_every)(func)
+
 def create_dashboard():
     """Create the main monitoring dashboard"""
     
@@ -146,138 +140,182 @@ def create_dashboard():
     status_col, metrics_col = st.columns([1, 3])
     
     with status_col:
-        if st.session_state.monitoring:
+        if st.session_state.monitor.running:
             st.success("🟢 System Active")
+        elif st.session_state.monitoring:
+            # The monitoring thread exited on its own; details are in the log
+            st.error("🔴 Monitoring Stopped Unexpectedly")
         else:
             st.error("🔴 System Inactive")
     
     with metrics_col:
-        # Get latest data for metrics
-        latest_data = st.session_state.logger.get_latest_data()
-        if latest_data:
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.metric("Current Magnitude", f"{latest_data['processed_magnitude']:.2f}")
-            with col2:
-                st.metric("Threshold", f"{st.session_state.detector.threshold:.2f}")
-            with col3:
-                alert_count = len([a for a in st.session_state.alert_history if a['timestamp'] > datetime.now() - timedelta(hours=1)])
-                st.metric("Alerts (1h)", alert_count)
-            with col4:
-                st.metric("Data Points", len(st.session_state.logger.data))
+        live_fragment(create_metrics)()
     
     # Real-time charts
-    if st.session_state.monitoring or st.session_state.logger.data:
-        create_real_time_charts()
+    if st.session_state.monitoring or st.session_state.logger.count():
+        live_fragment(create_real_time_charts)()
     
     # Alert notifications
-    create_alert_section()
+    live_fragment(create_alert_section)()
     
     # Historical data analysis
-    create_historical_analysis()
+    live_fragment(create_historical_analysis, interval="5s")()
+
+def create_metrics():
+    """Create the current-status metric row"""
+    
+    # Get latest data for metrics
+    latest_data = st.session_state.logger.get_latest_data()
+    if latest_data:
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Current Magnitude", f"{latest_data['processed_magnitude']:.2f}")
+        with col2:
+            st.metric("Threshold", f"{st.session_state.detector.threshold:.2f}")
+        with col3:
+            st.metric("Alerts (1h)", st.session_state.monitor.count_recent_alerts())
+        with col4:
+            st.metric("Data Points", st.session_state.logger.count())
+
+def downsample_minmax(x, y, n_out=800):
+    """
+    Reduce a series to at most n_out points for plotting by keeping the
+    min and max sample of each bucket, which preserves peaks and the visual envelope
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    n_buckets = max(n_out // 2, 1)
+    if n <= n_out:
+        return x, y
+    
+    # Pad with the last value to a whole number of equal buckets so min/max
+    # can be found in one vectorized pass
+    bucket_size = -(-n // n_buckets)
+    n_buckets = -(-n // bucket_size)
+    padded = np.full(n_buckets * bucket_size, y[-1])
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, bucket_size)
+    
+    offsets = np.arange(n_buckets) * bucket_size
+    indices = np.concatenate([
+        offsets + np.argmin(buckets, axis=1),
+        offsets + np.argmax(buckets, axis=1)
+    ])
+    indices = np.minimum(indices, n - 1)
+    indices = np.unique(indices)  # Sorted, and drops duplicates for flat buckets
+    
+    return x[indices], y[indices]
+
+def get_downsampled_traces(arrays, columns):
+    """
+    Downsample chart columns against the timestamp axis, reusing the previous
+    result when the data window hasn't changed since the last run
+    """
+    timestamps = arrays['timestamp']
+    key = (len(timestamps), timestamps[-1])
+    cached = st.session_state.get('downsampled_traces')
+    if cached and cached['key'] == key:
+        return cached['traces']
+    
+    traces = {
+        column: downsample_minmax(timestamps, arrays[column], CHART_MAX_POINTS)
+        for column in columns
+    }
+    st.session_state.downsampled_traces = {'key': key, 'traces': traces}
+    return traces
+
+def build_real_time_figure():
+    """
+    Create the real-time dashboard figure with all of its traces.
+    Built once per session; later runs only replace the trace data.
+    """
+    # Create subplot with multiple y-axes
+    fig = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=('Vibration Magnitude', 'X-Y-Z Components', 'Signal Comparison', 'Alert Timeline'),
+        specs=[[{"secondary_y": False}, {"secondary_y": False}],
+               [{"secondary_y": True}, {"secondary_y": False}]]
+    )
+    
+    # Magnitude chart with threshold line
+    fig.add_trace(
+        go.Scattergl(mode='lines', name='Processed Magnitude', line=dict(color='blue', width=2)),
+        row=1, col=1
+    )
+    fig.add_trace(
+        go.Scattergl(mode='lines', name='Threshold', line=dict(color='red', dash='dash', width=2)),
+        row=1, col=1
+    )
+    
+    # X-Y-Z components
+    fig.add_trace(go.Scattergl(mode='lines', name='X-axis', line=dict(color='red')), row=1, col=2)
+    fig.add_trace(go.Scattergl(mode='lines', name='Y-axis', line=dict(color='green')), row=1, col=2)
+    fig.add_trace(go.Scattergl(mode='lines', name='Z-axis', line=dict(color='blue')), row=1, col=2)
+    
+    # Raw vs Processed comparison
+    fig.add_trace(go.Scattergl(mode='lines', name='Raw Signal', line=dict(color='orange')), row=2, col=1)
+    fig.add_trace(go.Scattergl(mode='lines', name='Filtered Signal', line=dict(color='blue')), row=2, col=1)
+    
+    # Alert timeline
+    fig.add_trace(
+        go.Scattergl(mode='markers', name='Alerts', marker=dict(color='red', size=10, symbol='diamond')),
+        row=2, col=2
+    )
+    
+    fig.update_layout(
+        height=600,
+        showlegend=True,
+        title_text="Vibration Monitoring Dashboard"
+    )
+    
+    return fig
 
 def create_real_time_charts():
     """Create real-time visualization charts"""
     
     st.subheader("📊 Real-time Monitoring")
     
-    data = st.session_state.logger.get_recent_data(100)  # Last 100 points
+    arrays = st.session_state.logger.get_recent_arrays(100)  # Last 100 points
+    timestamps = arrays['timestamp']
     
-    if data:
-        df = pd.DataFrame(data)
-        
-        # Create subplot with multiple y-axes
-        fig = make_subplots(
-            rows=2, cols=2,
-            subplot_titles=('Vibration Magnitude', 'X-Y-Z Components', 'Signal Comparison', 'Alert Timeline'),
-            specs=[[{"secondary_y": False}, {"secondary_y": False}],
-                   [{"secondary_y": True}, {"secondary_y": False}]]
-        )
-        
-        # Magnitude chart with threshold line
-        fig.add_trace(
-            go.Scatter(
-                x=df['timestamp'], 
-                y=df['processed_magnitude'],
-                mode='lines',
-                name='Processed Magnitude',
-                line=dict(color='blue', width=2)
-            ),
-            row=1, col=1
-        )
-        
-        fig.add_trace(
-            go.Scatter(
-                x=df['timestamp'],
-                y=[st.session_state.detector.threshold] * len(df),
-                mode='lines',
-                name='Threshold',
-                line=dict(color='red', dash='dash', width=2)
-            ),
-            row=1, col=1
-        )
-        
-        # X-Y-Z components
-        fig.add_trace(
-            go.Scatter(x=df['timestamp'], y=df['x_axis'], name='X-axis', line=dict(color='red')),
-            row=1, col=2
-        )
-        fig.add_trace(
-            go.Scatter(x=df['timestamp'], y=df['y_axis'], name='Y-axis', line=dict(color='green')),
-            row=1, col=2
-        )
-        fig.add_trace(
-            go.Scatter(x=df['timestamp'], y=df['z_axis'], name='Z-axis', line=dict(color='blue')),
-            row=1, col=2
-        )
+    if len(timestamps):
+        if 'real_time_fig' not in st.session_state:
+            st.session_state.real_time_fig = build_real_time_figure()
+        fig = st.session_state.real_time_fig
         
-        # Raw vs Processed comparison
-        fig.add_trace(
-            go.Scatter(x=df['timestamp'], y=df['raw_magnitude'], name='Raw Signal', line=dict(color='orange')),
-            row=2, col=1
-        )
-        fig.add_trace(
-            go.Scatter(x=df['timestamp'], y=df['processed_magnitude'], name='Filtered Signal', line=dict(color='blue')),
-            row=2, col=1
+        traces = get_downsampled_traces(
+            arrays, ['processed_magnitude', 'x_axis', 'y_axis', 'z_axis', 'raw_magnitude']
         )
+        alerts = arrays['alert']
         
-        # Alert timeline
-        alert_df = df[df['alert'] == True]
-        if not alert_df.empty:
-            fig.add_trace(
-                go.Scatter(
-                    x=alert_df['timestamp'], 
-                    y=alert_df['processed_magnitude'],
-                    mode='markers',
-                    name='Alerts',
-                    marker=dict(color='red', size=10, symbol='diamond')
-                ),
-                row=2, col=2
-            )
+        # Update trace data in place, in the order the traces were added
+        trace_data = [
+            traces['processed_magnitude'],
+            (timestamps[[0, -1]], [st.session_state.detector.threshold] * 2),
+            traces['x_axis'],
+            traces['y_axis'],
+            traces['z_axis'],
+            traces['raw_magnitude'],
+            traces['processed_magnitude'],
+            (timestamps[alerts], arrays['processed_magnitude'][alerts])
+        ]
+        with fig.batch_update():
+            for trace, (x, y) in zip(fig.data, trace_data):
+                trace.x = x
+                trace.y = y
         
-        fig.update_layout(
-            height=600,
-            showlegend=True,
-            title_text="Vibration Monitoring Dashboard"
-        )
-        
-        # Update chart every second if monitoring
         chart_placeholder = st.empty()
-        chart_placeholder.plotly_chart(fig, use_container_width=True)
-        
-        if st.session_state.monitoring:
-            time.sleep(1)
-            st.rerun()
+        chart_placeholder.plotly_chart(fig, use_container_width=True, config={'staticPlot': False})
 
 def create_alert_section():
     """Create alert notifications section"""
     
     st.subheader("🚨 Alert Notifications")
     
-    if st.session_state.alert_history:
-        # Show recent alerts
-        recent_alerts = sorted(st.session_state.alert_history, key=lambda x: x['timestamp'], reverse=True)[:5]
-        
+    # Show recent alerts
+    recent_alerts = st.session_state.monitor.get_recent_alerts(5)
+    if recent_alerts:
         for alert in recent_alerts:
             alert_time = alert['timestamp'].strftime("%Y-%m-%d %H:%M:%S")
             if datetime.now() - alert['timestamp'] < timedelta(minutes=5):
@@ -287,62 +325,77 @@ def create_alert_section():
     else:
         st.info("No alerts recorded yet.")
 
+@st.cache_data(ttl=5, max_entries=4)
+def compute_trend_figure(data_key, _timestamps, _magnitude):
+    """
+    Build the historical trend figure.
+    Cached on data_key (row count, last timestamp) so the arrays themselves are never hashed.
+    """
+    if len(_magnitude) <= 10:
+        return None
+    
+    # Calculate moving average
+    window = 10
+    moving_avg = np.convolve(_magnitude, np.ones(window) / window, mode='valid')
+    
+    # The resampler only ships an aggregated view of the full series to the browser
+    trend_fig = FigureResampler(go.Figure(), default_n_shown_samples=CHART_MAX_POINTS)
+    trend_fig.add_trace(
+        go.Scattergl(mode='lines', name='Magnitude', opacity=0.7),
+        hf_x=_timestamps,
+        hf_y=_magnitude
+    )
+    trend_fig.add_trace(
+        go.Scattergl(mode='lines', name='Moving Average', line=dict(color='red', width=3)),
+        hf_x=_timestamps[window - 1:],
+        hf_y=moving_avg
+    )
+    
+    trend_fig.update_layout(
+        title="Vibration Trend Analysis",
+        height=300
+    )
+    
+    return trend_fig
+
 def create_historical_analysis():
     """Create historical data analysis section"""
     
     st.subheader("📈 Historical Analysis")
     
-    data = st.session_state.logger.data
+    logger = st.session_state.logger
     
-    if data:
-        df = pd.DataFrame(data)
-        
+    # Aggregates are computed by the database; no rows are transferred for them
+    summary = logger.get_summary_statistics()
+    
+    if summary:
         col1, col2 = st.columns(2)
         
         with col1:
             # Statistics
             st.write("**System Statistics**")
             stats = {
-                'Total Data Points': len(df),
-                'Average Magnitude': f"{df['processed_magnitude'].mean():.2f}",
-                'Max Magnitude': f"{df['processed_magnitude'].max():.2f}",
-                'Min Magnitude': f"{df['processed_magnitude'].min():.2f}",
-                'Total Alerts': len([a for a in st.session_state.alert_history]),
-                'Alert Rate': f"{(df['alert'].sum() / len(df) * 100):.1f}%" if len(df) > 0 else "0%"
+                'Total Data Points': logger.count(),
+                'Average Magnitude': f"{summary['mean']:.2f}",
+                'Max Magnitude': f"{summary['max']:.2f}",
+                'Min Magnitude': f"{summary['min']:.2f}",
+                'Total Alerts': st.session_state.monitor.total_alerts,
+                'Alert Rate': f"{summary['alert_rate'] * 100:.1f}%"
             }
             
             for key, value in stats.items():
                 st.metric(key, value)
         
         with col2:
-            # Trend analysis
+            # Trend analysis, drawn from the two columns it needs
             st.write("**Trend Analysis**")
-            if len(df) > 10:
-                # Calculate moving average
-                df['moving_avg'] = df['processed_magnitude'].rolling(window=10).mean()
-                
-                trend_fig = go.Figure()
-                trend_fig.add_trace(go.Scatter(
-                    x=df['timestamp'], 
-                    y=df['processed_magnitude'],
-                    mode='lines',
-                    name='Magnitude',
-                    opacity=0.7
-                ))
-                trend_fig.add_trace(go.Scatter(
-                    x=df['timestamp'], 
-                    y=df['moving_avg'],
-                    mode='lines',
-                    name='Moving Average',
-                    line=dict(color='red', width=3)
-                ))
-                
-                trend_fig.update_layout(
-                    title="Vibration Trend Analysis",
-                    height=300
-                )
-                
-                st.plotly_chart(trend_fig, use_container_width=True)
+            arrays = logger.get_recent_arrays(logger.data_window)
+            timestamps = arrays['timestamp']
+            if len(timestamps):
+                data_key = (len(timestamps), timestamps[-1])
+                trend_fig = compute_trend_figure(data_key, timestamps, arrays['processed_magnitude'])
+                if trend_fig is not None:
+                    st.plotly_chart(trend_fig, use_container_width=True)
     else:
         st.info("No historical data available yet. Start monitoring to collect data.")
 
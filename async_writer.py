@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy.engine import make_url
+from database import DATABASE_URL, engine
+
+try:
+    import asyncpg
+except ImportError:
+    # asyncpg is only used for PostgreSQL; other databases use the synchronous fallback
+    asyncpg = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Column order for the prepared asyncpg INSERT
+INSERT_COLUMNS = (
+    'timestamp', 'sensor_id', 'raw_magnitude', 'processed_magnitude',
+    'x_axis', 'y_axis', 'z_axis', 'alert', 'config_id', 'created_at'
+)
+ASYNCPG_INSERT_SQL = (
+    f"INSERT INTO vibration_data ({', '.join(INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join(f'${i}' for i in range(1, len(INSERT_COLUMNS) + 1))})"
+)
+
+class AsyncBatchWriter:
+    """
+    Writes batches of vibration rows on a background asyncio event loop, so database
+    round-trips overlap with sampling instead of blocking the caller.
+    On PostgreSQL with asyncpg installed, rows go through one long-lived connection and
+    a statement prepared once; otherwise sync_insert runs on the loop's own thread.
+    Batches are written one at a time, in submission order.
+    """
+    
+    def __init__(self, sync_insert, sync_prune):
+        self._sync_insert = sync_insert  # Callable taking a list of row dicts
+        self._sync_prune = sync_prune  # Callable enforcing the retention limit
+        self._use_asyncpg = asyncpg is not None and engine.dialect.name == 'postgresql'
+        self._connection = None
+        self._insert_statement = None
+        self._last_future = None
+        
+        self._loop = asyncio.new_event_loop()
+        self._write_lock = asyncio.Lock()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+    
+    def submit(self, rows, prune=False):
+        """Schedule rows to be written (and optionally a retention pass) and return immediately"""
+        self._last_future = asyncio.run_coroutine_threadsafe(self._write(rows, prune), self._loop)
+        return self._last_future
+    
+    def drain(self, timeout=30):
+        """Block until every submitted batch has been written"""
+        future = self._last_future
+        if future is not None:
+            try:
+                future.result(timeout)
+            except Exception as e:
+                logger.error(f"Timed out waiting for pending database writes: {e}")
+    
+    def close(self):
+        """Finish pending writes, then close the connection and stop the event loop"""
+        self.drain()
+        if self._connection is not None:
+            asyncio.run_coroutine_threadsafe(self._connection.close(), self._loop).result(5)
+            self._connection = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+    
+    async def _write(self, rows, prune):
+        # Writes are serialized: one asyncpg connection can't run statements concurrently
+        async with self._write_lock:
+            try:
+                if self._use_asyncpg:
+                    try:
+                        await self._write_asyncpg(rows)
+                    except Exception as e:
+                        # Drop the connection so the next batch reconnects and re-prepares,
+                        # and write this batch through the synchronous path instead of losing it
+                        logger.warning(f"asyncpg write failed, falling back to a synchronous insert: {e}")
+                        await self._reset_connection()
+                        self._sync_insert(rows)
+                else:
+                    # Blocking is fine here: the loop exists only to run these writes,
+                    # and it keeps working during interpreter shutdown, unlike an executor
+                    self._sync_insert(rows)
+                
+                if prune:
+                    self._sync_prune()
+            
+            except Exception as e:
+                logger.error(f"Error writing entries to database: {e}")
+    
+    async def _reset_connection(self):
+        connection = self._connection
+        self._connection = None
+        self._insert_statement = None
+        if connection is not None:
+            try:
+                await connection.close(timeout=5)
+            except Exception:
+                # Already broken; nothing left to release
+                pass
+    
+    async def _write_asyncpg(self, rows):
+        if self._connection is None:
+            dsn = make_url(DATABASE_URL).set(drivername='postgresql').render_as_string(hide_password=False)
+            self._connection = await asyncpg.connect(dsn)
+            self._insert_statement = await self._connection.prepare(ASYNCPG_INSERT_SQL)
+        
+        # asyncpg is strict about types, so coerce numpy scalars to Python values
+        created_at = datetime.utcnow()
+        records = [
+            (
+                row['timestamp'],
+                row['sensor_id'],
+                float(row['raw_magnitude']),
+                float(row['processed_magnitude']),
+                float(row['x_axis']),
+                float(row['y_axis']),
+                float(row['z_axis']),
+                bool(row['alert']),
+                row['config_id'],
+                created_at
+            )
+            for row in rows
+        ]
+        await self._insert_statement.executemany(records)
@@ -1,183 +1,316 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+import atexit
 import json
 import logging
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import desc, and_
-from database import VibrationData, AlertHistory, get_db_session, init_database
+import threading
+import time
+from sqlalchemy import and_, case, func, select, text
+from database import VibrationData, AlertHistory, Configuration, engine, ensure_initialized
+from async_writer import AsyncBatchWriter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Column layout of the in-memory ring buffer (struct-of-arrays)
+RING_COLUMNS = {
+    'timestamp': 'datetime64[us]',
+    'raw_magnitude': 'f4',
+    'processed_magnitude': 'f4',
+    'x_axis': 'f4',
+    'y_axis': 'f4',
+    'z_axis': 'f4',
+    'alert': 'bool',
+    'sensor_id': 'object'
+}
+
+# Core statements for the hot paths, built once and reused for every call
+VIBRATION_TABLE = VibrationData.__table__
+INSERT_STMT = VIBRATION_TABLE.insert()
+CONFIG_INSERT_STMT = Configuration.__table__.insert()
+READ_COLUMNS = [VIBRATION_TABLE.c[name] for name in RING_COLUMNS]
+RECENT_ROWS_STMT = select(*READ_COLUMNS).order_by(VIBRATION_TABLE.c.timestamp.desc())
+SUMMARY_STMT = select(
+    func.count(),
+    func.avg(VIBRATION_TABLE.c.processed_magnitude),
+    func.min(VIBRATION_TABLE.c.processed_magnitude),
+    func.max(VIBRATION_TABLE.c.processed_magnitude),
+    func.avg(case((VIBRATION_TABLE.c.alert, 1), else_=0))  # Portable alert rate
+)
+
+# Server-side CSV export for PostgreSQL
+EXPORT_COPY_SQL = (
+    f"COPY (SELECT {', '.join(RING_COLUMNS)} FROM vibration_data ORDER BY timestamp) "
+    "TO STDOUT WITH CSV HEADER"
+)
+
 class DataLogger:
     """
     Data logging class for storing and retrieving vibration data with database persistence
     """
     
     def __init__(self):
+        self.max_data_points = 50000  # Increased limit for database storage
+        self.data_window = 1000  # Rows exposed through the data property
+        self._lock = threading.Lock()
+        self._trend_cache = None
+        
+        # Recent entries are kept in memory so reads don't hit the database
+        self._reset_ring()
+        
         # Initialize database
         try:
-            init_database()
+            ensure_initialized()
             logger.info("Database initialized successfully")
         except Exception as e:
             logger.error(f"Database initialization failed: {e}")
             # Fallback to in-memory storage
-            self._data = []
             self.use_database = False
             return
         
         self.use_database = True
-        self.max_data_points = 50000  # Increased limit for database storage
+        
+        # Write buffer: entries are inserted in bulk rather than one commit per tick
+        self.flush_size = 200
+        self.flush_interval = 2.0  # Seconds between forced flushes
+        self.prune_interval = 1000  # Inserted rows between retention passes
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._rows_since_prune = 0
+        
+        # Flushed batches are written on a background event loop
+        self._writer = AsyncBatchWriter(self._insert_rows, self._prune_old_data)
+        
+        # Don't lose buffered rows on interpreter shutdown
+        atexit.register(self._shutdown)
+        
+        self._preload_ring()
+    
+    def _reset_ring(self):
+        """Allocate an empty ring buffer holding up to max_data_points entries"""
+        self._cols = {
+            name: np.empty(self.max_data_points, dtype=dtype)
+            for name, dtype in RING_COLUMNS.items()
+        }
+        self._head = 0  # Next slot to write
+        self._size = 0  # Number of valid slots
+        self._version = 0  # Bumped on every change, used to invalidate cached frames
+        self._frame_cache = None
+    
+    def _append_to_ring(self, entry):
+        """Write one entry into the next ring slot (caller holds the lock)"""
+        i = self._head
+        cols = self._cols
+        cols['timestamp'][i] = entry['timestamp']
+        cols['raw_magnitude'][i] = entry['raw_magnitude']
+        cols['processed_magnitude'][i] = entry['processed_magnitude']
+        cols['x_axis'][i] = entry['x_axis']
+        cols['y_axis'][i] = entry['y_axis']
+        cols['z_axis'][i] = entry['z_axis']
+        cols['alert'][i] = entry['alert']
+        cols['sensor_id'][i] = entry.get('sensor_id', 'sensor_1')
+        
+        self._head = (i + 1) % self.max_data_points
+        self._size = min(self._size + 1, self.max_data_points)
+        self._version += 1
+    
+    def _ring_columns(self, count):
+        """
+        Get the most recent count entries as a dict of column arrays in chronological order.
+        Returns views into the ring unless the requested range wraps around.
+        """
+        count = min(count, self._size)
+        start = self._head - count
+        if start >= 0:
+            index = slice(start, self._head)
+        else:
+            index = np.r_[start % self.max_data_points:self.max_data_points, 0:self._head]
+        return {name: column[index] for name, column in self._cols.items()}
+    
+    def _ring_records(self, count):
+        """Get the most recent count entries as a list of dictionaries"""
+        with self._lock:
+            columns = self._ring_columns(count)
+            # tolist() converts to native Python types (datetime, float, bool) in one pass
+            values = [column.tolist() for column in columns.values()]
+        return [dict(zip(columns, row)) for row in zip(*values)]
+    
+    def _preload_ring(self):
+        """Fill the ring with the most recent database rows once at startup"""
+        try:
+            with engine.connect() as conn:
+                rows = conn.execute(RECENT_ROWS_STMT.limit(self.max_data_points)).all()
+        except Exception as e:
+            logger.error(f"Error preloading recent data: {e}")
+            return
+        
+        rows.reverse()  # Oldest first
+        count = len(rows)
+        with self._lock:
+            for column, values in zip(self._cols.values(), zip(*rows)):
+                column[:count] = values
+            self._head = count % self.max_data_points
+            self._size = count
+            self._version += 1
     
     def add_entry(self, entry):
         """
         Add a new data entry to the log
         Entry should contain: timestamp, raw_magnitude, processed_magnitude, x_axis, y_axis, z_axis, alert
+        and optionally the config_id returned by add_configuration
         """
+        self.add_entries([entry])
+    
+    def add_entries(self, entries):
+        """Add a batch of data entries to the log under a single lock acquisition"""
         if not self.use_database:
             # Fallback to in-memory storage
-            self._data.append(entry)
-            if len(self._data) > self.max_data_points:
-                self._data = self._data[-self.max_data_points:]
+            with self._lock:
+                for entry in entries:
+                    self._append_to_ring(entry)
             return
         
-        session = None
-        try:
-            session = get_db_session()
-            
-            # Create database entry
-            db_entry = VibrationData(
-                timestamp=entry['timestamp'],
-                sensor_id=entry.get('sensor_id', 'sensor_1'),
-                raw_magnitude=entry['raw_magnitude'],
-                processed_magnitude=entry['processed_magnitude'],
-                x_axis=entry['x_axis'],
-                y_axis=entry['y_axis'],
-                z_axis=entry['z_axis'],
-                alert=entry['alert'],
-                threshold_used=entry.get('threshold_used', 2.0),
-                sensitivity_level=entry.get('sensitivity_level', 'Medium'),
-                filter_enabled=entry.get('filter_enabled', True)
-            )
-            
-            session.add(db_entry)
-            session.commit()
-            
-            # Clean up old data if we exceed limit
-            count = session.query(VibrationData).count()
-            if count > self.max_data_points:
-                # Delete oldest records
-                oldest_records = session.query(VibrationData).order_by(VibrationData.timestamp).limit(count - self.max_data_points)
-                for record in oldest_records:
-                    session.delete(record)
-                session.commit()
-            
-            session.close()
-            
-        except Exception as e:
-            logger.error(f"Error adding entry to database: {e}")
-            if session:
-                try:
-                    session.close()
-                except:
-                    pass
+        # Buffer plain mappings; ORM instances are only needed for reads
+        rows = [{
+            'timestamp': entry['timestamp'],
+            'sensor_id': entry.get('sensor_id', 'sensor_1'),
+            'raw_magnitude': entry['raw_magnitude'],
+            'processed_magnitude': entry['processed_magnitude'],
+            'x_axis': entry['x_axis'],
+            'y_axis': entry['y_axis'],
+            'z_axis': entry['z_axis'],
+            'alert': entry['alert'],
+            'config_id': entry.get('config_id')
+        } for entry in entries]
+        
+        with self._lock:
+            for entry in entries:
+                self._append_to_ring(entry)
+            self._buffer.extend(rows)
+            flush_due = (len(self._buffer) >= self.flush_size or
+                         time.monotonic() - self._last_flush >= self.flush_interval)
+        
+        if flush_due:
+            self._flush()
     
-    def get_latest_data(self):
-        """Get the most recent data entry"""
+    def add_configuration(self, threshold, sensitivity_level, filter_enabled, smoothing_window):
+        """
+        Record a new detector/processing configuration, to be called when the settings change.
+        Returns the configuration id for log entries, or None without a database.
+        """
         if not self.use_database:
-            # Fallback to in-memory storage
-            if self._data:
-                return self._data[-1]
             return None
         
         try:
-            session = get_db_session()
-            latest_record = session.query(VibrationData).order_by(desc(VibrationData.timestamp)).first()
-            session.close()
-            
-            if latest_record:
-                return {
-                    'timestamp': latest_record.timestamp,
-                    'raw_magnitude': latest_record.raw_magnitude,
-                    'processed_magnitude': latest_record.processed_magnitude,
-                    'x_axis': latest_record.x_axis,
-                    'y_axis': latest_record.y_axis,
-                    'z_axis': latest_record.z_axis,
-                    'alert': latest_record.alert,
-                    'sensor_id': latest_record.sensor_id
-                }
-            return None
+            with engine.begin() as conn:
+                result = conn.execute(CONFIG_INSERT_STMT, {
+                    'threshold': threshold,
+                    'sensitivity_level': sensitivity_level,
+                    'filter_enabled': filter_enabled,
+                    'smoothing_window': smoothing_window,
+                    'effective_from': datetime.now()
+                })
+            return result.inserted_primary_key[0]
             
         except Exception as e:
-            logger.error(f"Error getting latest data: {e}")
+            logger.error(f"Error recording configuration: {e}")
             return None
     
+    def _flush(self, wait=False):
+        """
+        Hand all buffered entries to the background writer as one batch.
+        With wait=True, block until they (and any earlier batches) are in the database.
+        """
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            
+            # Enforce the retention limit periodically instead of on every insert
+            self._rows_since_prune += len(rows)
+            prune_due = self._rows_since_prune >= self.prune_interval
+            if prune_due:
+                self._rows_since_prune = 0
+        
+        if rows:
+            self._writer.submit(rows, prune=prune_due)
+        if wait:
+            self._writer.drain()
+    
+    def _shutdown(self):
+        """Write out buffered entries and stop the background writer"""
+        self._flush()
+        self._writer.close()
+    
+    def _insert_rows(self, rows):
+        """Insert a batch of rows in one transaction"""
+        # executemany through Core: no ORM objects or identity-map bookkeeping
+        with engine.begin() as conn:
+            conn.execute(INSERT_STMT, rows)
+    
+    def _prune_old_data(self):
+        """
+        Delete everything older than the newest max_data_points records in one statement.
+        The subquery walks the timestamp index, so no table-wide COUNT is needed.
+        """
+        with engine.begin() as conn:
+            conn.execute(
+                text("DELETE FROM vibration_data WHERE timestamp <= "
+                     "(SELECT timestamp FROM vibration_data ORDER BY timestamp DESC LIMIT 1 OFFSET :keep)"),
+                {'keep': self.max_data_points}
+            )
+    
+    def count(self):
+        """
+        Number of stored entries, read from the in-memory ring without building a DataFrame.
+        The ring mirrors the database retention limit and includes rows not yet flushed.
+        """
+        return self._size
+    
+    def get_latest_data(self):
+        """Get the most recent data entry"""
+        records = self._ring_records(1)
+        if records:
+            return records[0]
+        return None
+    
     def get_recent_data(self, count=100):
         """Get the most recent N data entries"""
-        if not self.use_database:
-            # Fallback to in-memory storage
-            if len(self._data) >= count:
-                return self._data[-count:]
-            return self._data
-        
-        try:
-            session = get_db_session()
-            records = session.query(VibrationData).order_by(desc(VibrationData.timestamp)).limit(count).all()
-            session.close()
-            
-            # Convert to list of dictionaries
-            data_list = []
-            for record in reversed(records):  # Reverse to get chronological order
-                data_list.append({
-                    'timestamp': record.timestamp,
-                    'raw_magnitude': record.raw_magnitude,
-                    'processed_magnitude': record.processed_magnitude,
-                    'x_axis': record.x_axis,
-                    'y_axis': record.y_axis,
-                    'z_axis': record.z_axis,
-                    'alert': record.alert,
-                    'sensor_id': record.sensor_id
-                })
-            
-            return data_list
-            
-        except Exception as e:
-            logger.error(f"Error getting recent data: {e}")
-            return []
+        return self._ring_records(count)
+    
+    def get_recent_arrays(self, count=100):
+        """
+        Get the most recent N data entries as a dict of numpy column arrays in chronological order.
+        Plotting code can consume these directly without building dictionaries or a DataFrame.
+        """
+        with self._lock:
+            # Copy out of the ring so later writes can't change the returned arrays
+            return {name: np.array(column) for name, column in self._ring_columns(count).items()}
+    
+    def _query_records(self, condition):
+        """Fetch rows matching a condition in chronological order as dictionaries"""
+        query = select(*READ_COLUMNS).where(condition).order_by(VIBRATION_TABLE.c.timestamp)
+        with engine.connect() as conn:
+            return [dict(row) for row in conn.execute(query).mappings()]
     
     def get_data_by_time_range(self, start_time, end_time):
         """Get data within a specific time range"""
         if not self.use_database:
             # Fallback to in-memory storage
             filtered_data = []
-            for entry in self._data:
+            for entry in self._ring_records(self._size):
                 if start_time <= entry['timestamp'] <= end_time:
                     filtered_data.append(entry)
             return filtered_data
         
+        # Make sure buffered entries are visible to the query
+        self._flush(wait=True)
+        
         try:
-            session = get_db_session()
-            records = session.query(VibrationData).filter(
-                and_(VibrationData.timestamp >= start_time, VibrationData.timestamp <= end_time)
-            ).order_by(VibrationData.timestamp).all()
-            session.close()
-            
-            # Convert to list of dictionaries
-            data_list = []
-            for record in records:
-                data_list.append({
-                    'timestamp': record.timestamp,
-                    'raw_magnitude': record.raw_magnitude,
-                    'processed_magnitude': record.processed_magnitude,
-                    'x_axis': record.x_axis,
-                    'y_axis': record.y_axis,
-                    'z_axis': record.z_axis,
-                    'alert': record.alert,
-                    'sensor_id': record.sensor_id
-                })
-            
-            return data_list
+            return self._query_records(
+                and_(VIBRATION_TABLE.c.timestamp >= start_time, VIBRATION_TABLE.c.timestamp <= end_time)
+            )
             
         except Exception as e:
             logger.error(f"Error getting data by time range: {e}")
@@ -188,33 +321,16 @@ class DataLogger:
         if not self.use_database:
             # Fallback to in-memory storage
             filtered_data = []
-            for entry in self._data:
+            for entry in self._ring_records(self._size):
                 if entry['timestamp'] >= since_time:
                     filtered_data.append(entry)
             return filtered_data
         
+        # Make sure buffered entries are visible to the query
+        self._flush(wait=True)
+        
         try:
-            session = get_db_session()
-            records = session.query(VibrationData).filter(
-                VibrationData.timestamp >= since_time
-            ).order_by(VibrationData.timestamp).all()
-            session.close()
-            
-            # Convert to list of dictionaries
-            data_list = []
-            for record in records:
-                data_list.append({
-                    'timestamp': record.timestamp,
-                    'raw_magnitude': record.raw_magnitude,
-                    'processed_magnitude': record.processed_magnitude,
-                    'x_axis': record.x_axis,
-                    'y_axis': record.y_axis,
-                    'z_axis': record.z_axis,
-                    'alert': record.alert,
-                    'sensor_id': record.sensor_id
-                })
-            
-            return data_list
+            return self._query_records(VIBRATION_TABLE.c.timestamp >= since_time)
             
         except Exception as e:
             logger.error(f"Error getting data since time: {e}")
@@ -224,30 +340,13 @@ class DataLogger:
         """Get only entries where alerts were triggered"""
         if not self.use_database:
             # Fallback to in-memory storage
-            return [entry for entry in self._data if entry.get('alert', False)]
+            return [entry for entry in self._ring_records(self._size) if entry.get('alert', False)]
+        
+        # Make sure buffered entries are visible to the query
+        self._flush(wait=True)
         
         try:
-            session = get_db_session()
-            records = session.query(VibrationData).filter(
-                VibrationData.alert == True
-            ).order_by(VibrationData.timestamp).all()
-            session.close()
-            
-            # Convert to list of dictionaries
-            data_list = []
-            for record in records:
-                data_list.append({
-                    'timestamp': record.timestamp,
-                    'raw_magnitude': record.raw_magnitude,
-                    'processed_magnitude': record.processed_magnitude,
-                    'x_axis': record.x_axis,
-                    'y_axis': record.y_axis,
-                    'z_axis': record.z_axis,
-                    'alert': record.alert,
-                    'sensor_id': record.sensor_id
-                })
-            
-            return data_list
+            return self._query_records(VIBRATION_TABLE.c.alert == True)
             
         except Exception as e:
             logger.error(f"Error getting alert data: {e}")
@@ -255,17 +354,22 @@ class DataLogger:
     
     def clear_data(self):
         """Clear all logged data"""
+        with self._lock:
+            self._reset_ring()
+            # Drop entries that haven't been flushed yet
+            if self.use_database:
+                self._buffer = []
+        
         if not self.use_database:
-            # Fallback to in-memory storage
-            self._data = []
             return
         
+        # Let in-flight batches land first so they don't reappear after the delete
+        self._writer.drain()
+        
         try:
-            session = get_db_session()
-            session.query(VibrationData).delete()
-            session.query(AlertHistory).delete()
-            session.commit()
-            session.close()
+            with engine.begin() as conn:
+                conn.execute(VIBRATION_TABLE.delete())
+                conn.execute(AlertHistory.__table__.delete())
             logger.info("All data cleared from database")
             
         except Exception as e:
@@ -273,23 +377,28 @@ class DataLogger:
     
     @property
     def data(self):
-        """Get all data for compatibility with existing code"""
-        if not self.use_database:
-            return getattr(self, '_data', [])
+        """
+        Get the most recent data_window entries as a DataFrame.
+        The frame is cached and only rebuilt after new entries are logged.
+        """
+        cached = self._frame_cache
+        if cached is not None and cached[0] == self._version:
+            return cached[1]
         
-        # For database, return recent data to avoid memory issues
-        return self.get_recent_data(1000)
+        with self._lock:
+            version = self._version
+            frame = pd.DataFrame(self._ring_columns(self.data_window))
+        self._frame_cache = (version, frame)
+        return frame
     
     def get_statistics(self):
         """Calculate basic statistics for the logged data"""
-        data = self.data
-        if not data:
+        df = self.data
+        if df.empty:
             return None
         
-        df = pd.DataFrame(data)
-        
         stats = {
-            'total_entries': len(data),
+            'total_entries': len(df),
             'time_range': {
                 'start': df['timestamp'].min(),
                 'end': df['timestamp'].max(),
@@ -311,23 +420,98 @@ class DataLogger:
         
         return stats
     
-    def export_to_csv(self, filename=None):
-        """Export data to CSV file"""
-        data = self.data
-        if not data:
+    def get_summary_statistics(self):
+        """
+        Get count, mean, min and max of the processed magnitude plus the alert rate
+        over all stored entries, aggregated by the database instead of row by row
+        """
+        if not self.use_database:
+            with self._lock:
+                cols = self._ring_columns(self._size)
+                magnitude = cols['processed_magnitude']
+                if len(magnitude) == 0:
+                    return None
+                return {
+                    'count': len(magnitude),
+                    'mean': float(magnitude.mean()),
+                    'min': float(magnitude.min()),
+                    'max': float(magnitude.max()),
+                    'alert_rate': float(cols['alert'].mean())
+                }
+        
+        # Make sure buffered entries are counted
+        self._flush(wait=True)
+        
+        try:
+            with engine.connect() as conn:
+                count, mean, minimum, maximum, alert_rate = conn.execute(SUMMARY_STMT).one()
+        except Exception as e:
+            logger.error(f"Error computing summary statistics: {e}")
             return None
         
+        if not count:
+            return None
+        return {
+            'count': count,
+            'mean': float(mean),
+            'min': float(minimum),
+            'max': float(maximum),
+            'alert_rate': float(alert_rate)
+        }
+    
+    def export_to_csv(self, filename=None):
+        """Export data to CSV file"""
         if filename is None:
             filename = f"vibration_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         
-        df = pd.DataFrame(data)
+        # Stream the whole table with COPY when the database supports it
+        if self.use_database and self._copy_to_csv(filename):
+            return filename
+        
+        df = self.data
+        if df.empty:
+            return None
+        
         df.to_csv(filename, index=False)
         return filename
     
+    def _copy_to_csv(self, filename):
+        """
+        Export the table with PostgreSQL's COPY ... TO STDOUT, bypassing Python row formatting.
+        Returns False when the database or driver doesn't support COPY.
+        """
+        if engine.dialect.name != 'postgresql':
+            return False
+        
+        # Make sure buffered entries are included in the export
+        self._flush(wait=True)
+        
+        raw_connection = engine.raw_connection()
+        try:
+            cursor = raw_connection.cursor()
+            if hasattr(cursor, 'copy_expert'):
+                # psycopg2
+                with open(filename, 'wb') as f:
+                    cursor.copy_expert(EXPORT_COPY_SQL, f)
+            elif hasattr(cursor, 'copy'):
+                # psycopg 3
+                with open(filename, 'wb') as f, cursor.copy(EXPORT_COPY_SQL) as copy:
+                    for block in copy:
+                        f.write(block)
+            else:
+                return False
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error exporting with COPY, falling back to in-memory export: {e}")
+            return False
+        finally:
+            raw_connection.close()
+    
     def export_to_json(self, filename=None):
         """Export data to JSON file"""
-        data = self.data
-        if not data:
+        df = self.data
+        if df.empty:
             return None
         
         if filename is None:
@@ -335,7 +519,7 @@ class DataLogger:
         
         # Convert datetime objects to strings for JSON serialization
         json_data = []
-        for entry in data:
+        for entry in df.to_dict('records'):
             json_entry = entry.copy()
             json_entry['timestamp'] = entry['timestamp'].isoformat()
             json_data.append(json_entry)
@@ -356,16 +540,20 @@ class DataLogger:
         if len(recent_data) < 2:
             return None
         
-        df = pd.DataFrame(recent_data)
+        # Reuse the previous result if no new data arrived in the window
+        cache_key = (window_minutes, len(recent_data), recent_data[-1]['timestamp'])
+        if self._trend_cache is not None and self._trend_cache[0] == cache_key:
+            return self._trend_cache[1]
         
-        # Calculate trend (linear regression slope)
-        import numpy as np
-        timestamps_numeric = [(entry['timestamp'] - recent_data[0]['timestamp']).total_seconds() 
-                             for entry in recent_data]
+        df = pd.DataFrame(recent_data)
         
-        # Calculate linear trend
-        coeffs = np.polyfit(timestamps_numeric, df['processed_magnitude'], 1)
-        trend_slope = coeffs[0]
+        # Calculate trend (linear regression slope) in closed form: cov(t, y) / var(t)
+        timestamps = df['timestamp'].values.astype('datetime64[ns]')
+        t = (timestamps - timestamps[0]).astype('int64') * 1e-9
+        y = df['processed_magnitude'].to_numpy(dtype=np.float64)
+        t_centered = t - t.mean()
+        t_variance = (t_centered ** 2).sum()
+        trend_slope = (t_centered * (y - y.mean())).sum() / t_variance if t_variance > 0 else 0.0
         
         # Determine trend direction
         if abs(trend_slope) < 0.001:
@@ -389,4 +577,5 @@ class DataLogger:
             'recent_alerts': df['alert'].sum()
         }
         
+        self._trend_cache = (cache_key, trend_analysis)
         return trend_analysis
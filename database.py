@@ -1,8 +1,10 @@
 import os
+import functools
 import logging
-from sqlalchemy import create_engine, Column, Integer, Float, DateTime, Boolean, String, text
+from sqlalchemy import create_engine, inspect, Column, Integer, Float, DateTime, Boolean, String, ForeignKey, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from datetime import datetime
 
 # Configure logging
@@ -15,7 +17,20 @@ if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
 # Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL, echo=False)
+if DATABASE_URL.startswith('sqlite'):
+    # SQLite connections are cheap to open and shouldn't be shared across threads
+    engine = create_engine(DATABASE_URL, echo=False, poolclass=NullPool, future=True)
+else:
+    # Keep enough warm connections for the monitoring thread plus concurrent reruns
+    engine = create_engine(
+        DATABASE_URL,
+        echo=False,
+        pool_size=10,
+        max_overflow=20,
+        pool_recycle=3600,
+        pool_pre_ping=False,
+        future=True
+    )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -34,10 +49,27 @@ class VibrationData(Base):
     y_axis = Column(Float, nullable=False)
     z_axis = Column(Float, nullable=False)
     alert = Column(Boolean, nullable=False, default=False)
-    threshold_used = Column(Float, nullable=False)
+    config_id = Column(Integer, ForeignKey("configuration.id"), nullable=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Serves "latest readings for a sensor" queries straight from the index, newest first
+vibration_sensor_time_index = Index(
+    'ix_vib_sensor_ts_desc', VibrationData.sensor_id, VibrationData.timestamp.desc()
+)
+
+class Configuration(Base):
+    """
+    Database model for detector and signal processing settings.
+    A row is added whenever the settings change and vibration rows reference it.
+    """
+    __tablename__ = "configuration"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    threshold = Column(Float, nullable=False)
     sensitivity_level = Column(String, nullable=False)
     filter_enabled = Column(Boolean, nullable=False, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    smoothing_window = Column(Integer, nullable=False)
+    effective_from = Column(DateTime, nullable=False, default=datetime.utcnow)
 
 class AlertHistory(Base):
     """
@@ -55,10 +87,85 @@ class AlertHistory(Base):
     acknowledged = Column(Boolean, nullable=False, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+# Per-row settings columns replaced by config_id; present in databases created before the change
+LEGACY_SETTINGS_COLUMNS = ('threshold_used', 'sensitivity_level', 'filter_enabled')
+# Legacy rows didn't record the smoothing window; assume the processor's default
+LEGACY_SMOOTHING_WINDOW = 5
+
+def backfill_legacy_configurations(conn):
+    """
+    Move the per-row settings of legacy vibration rows into configuration rows:
+    one per distinct (threshold, sensitivity, filter) combination, linked through config_id
+    """
+    conn.execute(text(
+        "INSERT INTO configuration "
+        "(threshold, sensitivity_level, filter_enabled, smoothing_window, effective_from) "
+        "SELECT threshold_used, sensitivity_level, filter_enabled, :smoothing_window, MIN(timestamp) "
+        "FROM vibration_data "
+        "WHERE config_id IS NULL AND threshold_used IS NOT NULL "
+        "AND sensitivity_level IS NOT NULL AND filter_enabled IS NOT NULL "
+        "GROUP BY threshold_used, sensitivity_level, filter_enabled"
+    ), {'smoothing_window': LEGACY_SMOOTHING_WINDOW})
+    
+    # The rows just inserted have the highest ids, so MAX picks them over older matches
+    result = conn.execute(text(
+        "UPDATE vibration_data SET config_id = ("
+        "SELECT MAX(c.id) FROM configuration c "
+        "WHERE c.threshold = vibration_data.threshold_used "
+        "AND c.sensitivity_level = vibration_data.sensitivity_level "
+        "AND c.filter_enabled = vibration_data.filter_enabled) "
+        "WHERE config_id IS NULL AND threshold_used IS NOT NULL "
+        "AND sensitivity_level IS NOT NULL AND filter_enabled IS NOT NULL"
+    ))
+    if result.rowcount:
+        logger.info(f"Linked {result.rowcount} legacy vibration rows to configuration rows")
+
+def migrate_vibration_data():
+    """
+    Bring an existing vibration_data table up to the current schema.
+    create_all never alters existing tables, so older databases still have the NOT NULL
+    per-row settings columns and no config_id, and every insert would fail.
+    The recorded settings are backfilled into configuration rows before the
+    legacy columns are relaxed (PostgreSQL) or dropped (SQLite).
+    """
+    columns = {column['name']: column for column in inspect(engine).get_columns('vibration_data')}
+    legacy_columns = [name for name in LEGACY_SETTINGS_COLUMNS if name in columns]
+    if 'config_id' in columns and not legacy_columns:
+        return
+    
+    with engine.begin() as conn:
+        if 'config_id' not in columns:
+            conn.execute(text(
+                "ALTER TABLE vibration_data ADD COLUMN config_id INTEGER REFERENCES configuration(id)"
+            ))
+        
+        # Legacy columns linger on PostgreSQL, so this also picks up rows
+        # written by an older version since the last startup
+        if len(legacy_columns) == len(LEGACY_SETTINGS_COLUMNS):
+            backfill_legacy_configurations(conn)
+        
+        for name in legacy_columns:
+            if engine.dialect.name == 'postgresql':
+                # Keep the recorded settings, just stop requiring them on new rows
+                if not columns[name]['nullable']:
+                    conn.execute(text(f"ALTER TABLE vibration_data ALTER COLUMN {name} DROP NOT NULL"))
+            else:
+                # SQLite can't relax a NOT NULL constraint in place
+                conn.execute(text(f"ALTER TABLE vibration_data DROP COLUMN {name}"))
+    
+    # The config_id index is only created along with a new table
+    for index in VibrationData.__table__.indexes:
+        if index.name == 'ix_vibration_data_config_id':
+            index.create(bind=engine, checkfirst=True)
+    logger.info("Migrated vibration_data to the config_id schema")
+
 def create_tables():
     """Create database tables if they don't exist"""
     try:
         Base.metadata.create_all(bind=engine)
+        migrate_vibration_data()
+        # create_all only builds indexes together with new tables
+        vibration_sensor_time_index.create(bind=engine, checkfirst=True)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
@@ -87,6 +194,16 @@ def init_database():
         logger.error(f"Database initialization failed: {e}")
         return False
 
+@functools.lru_cache(maxsize=1)
+def ensure_initialized():
+    """
+    Initialize the database once per process; later calls return the cached result.
+    Raises on failure, so a failed attempt isn't cached and the next call retries.
+    """
+    if not init_database():
+        raise RuntimeError("Database initialization failed")
+    return True
+
 def get_db_session():
     """Get a database session for direct use"""
     return SessionLocal()
\ No newline at end of file
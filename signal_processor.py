@@ -1,16 +1,137 @@
+import functools
+import math
+import threading
 import numpy as np
-from collections import deque
 import scipy.signal as signal
+from scipy.ndimage import uniform_filter1d
+from numba import njit
+
+# Readings between full filtfilt passes in zero-phase mode
+FILTFILT_STRIDE = 8
+
+# Fixed-point formats for the integer filter: coefficients in Q2.29 (the
+# sections' b coefficients reach 2.0), samples and state scaled by 2**20
+COEFF_SHIFT = 29
+SAMPLE_SHIFT = 20
+SAMPLE_SCALE = float(1 << SAMPLE_SHIFT)
+
+@njit(cache=True, fastmath=True)
+def _update_ring(buf, sums, pos, xyz_in, xyz_out):
+    """
+    Push an (x, y, z) sample into a (window, 3) ring buffer, keeping per-axis running
+    sums so the window means are updated in O(1). pos holds (head, count) and is
+    updated in place; the means are written to xyz_out.
+    """
+    window = buf.shape[0]
+    head = pos[0]
+    count = pos[1]
+    full = count == window
+    if not full:
+        count += 1
+    for axis in range(3):
+        if full:
+            sums[axis] -= buf[head, axis]  # Evict the oldest value
+        buf[head, axis] = xyz_in[axis]
+        sums[axis] += xyz_in[axis]
+        xyz_out[axis] = sums[axis] / count
+    pos[0] = (head + 1) % window
+    pos[1] = count
+
+@njit(cache=True)
+def _biquad_fixed_block(sos_q, state_q, xyz_in, xyz_out):
+    """
+    Filter an (N, 3) block of samples through the second-order sections using
+    integer arithmetic only: int32 coefficients and state, int64 products,
+    rounded right shifts. xyz_in and xyz_out may be the same array.
+    """
+    half = np.int64(1) << (COEFF_SHIFT - 1)
+    for n in range(xyz_in.shape[0]):
+        for axis in range(3):
+            x = np.int64(round(xyz_in[n, axis] * SAMPLE_SCALE))
+            for i in range(sos_q.shape[0]):
+                y = ((sos_q[i, 0] * x + half) >> COEFF_SHIFT) + state_q[i, 0, axis]
+                state_q[i, 0, axis] = ((sos_q[i, 1] * x - sos_q[i, 4] * y + half) >> COEFF_SHIFT) + state_q[i, 1, axis]
+                state_q[i, 1, axis] = (sos_q[i, 2] * x - sos_q[i, 5] * y + half) >> COEFF_SHIFT
+                x = y
+            xyz_out[n, axis] = x / SAMPLE_SCALE
+
+@functools.lru_cache(maxsize=8)
+def _build_specialized_kernels(sos_key):
+    """
+    Generate and compile a filter step and a fused filter+smooth step for one fixed
+    set of second-order sections (given as a flat tuple of their coefficients).
+    The coefficients are baked in as literals and the section/axis loops are fully
+    unrolled, so the kernels do no coefficient loads or loop bookkeeping.
+    Cached, since every processor with the same design shares the same kernels.
+    Returns (filter_step(state, xyz_in, xyz_out), process_step(state, ring, ring_sums,
+    ring_pos, xyz_in, xyz_out) -> magnitude).
+    """
+    sections = [sos_key[i:i + 6] for i in range(0, len(sos_key), 6)]
+    
+    lines = []
+    for axis in range(3):
+        lines.append(f"x{axis} = xyz_in[{axis}]")
+    for i, (b0, b1, b2, _, a1, a2) in enumerate(sections):
+        for axis in range(3):
+            x, s0, s1 = f"x{axis}", f"state[{i}, 0, {axis}]", f"state[{i}, 1, {axis}]"
+            lines.append(f"y = {b0!r} * {x} + {s0}")
+            lines.append(f"{s0} = {b1!r} * {x} - ({a1!r}) * y + {s1}")
+            lines.append(f"{s1} = {b2!r} * {x} - ({a2!r}) * y")
+            lines.append(f"{x} = y")
+    for axis in range(3):
+        lines.append(f"xyz_out[{axis}] = x{axis}")
+    body = "\n".join("    " + line for line in lines)
+    
+    source = (
+        f"def filter_step(state, xyz_in, xyz_out):\n{body}\n\n"
+        f"def process_step(state, ring, ring_sums, ring_pos, xyz_in, xyz_out):\n{body}\n"
+        "    _update_ring(ring, ring_sums, ring_pos, xyz_out, xyz_out)\n"
+        "    return math.sqrt(xyz_out[0] * xyz_out[0] + xyz_out[1] * xyz_out[1] + xyz_out[2] * xyz_out[2])\n"
+    )
+    namespace = {'_update_ring': _update_ring, 'math': math}
+    exec(source, namespace)
+    filter_step = njit(fastmath=True)(namespace['filter_step'])
+    process_step = njit(fastmath=True)(namespace['process_step'])
+    
+    # Compile now rather than on the first reading
+    state = np.zeros((len(sections), 2, 3))
+    filter_step(state, np.zeros(3), np.zeros(3))
+    process_step(state, np.zeros((1, 3)), np.zeros(3), np.zeros(2, dtype=np.int64), np.zeros(3), np.zeros(3))
+    return filter_step, process_step
+
+# Compile once at import so the first reading doesn't pay the JIT cost
+_update_ring(np.zeros((1, 3)), np.zeros(3), np.zeros(2, dtype=np.int64), np.zeros(3), np.zeros(3))
+_biquad_fixed_block(np.zeros((1, 6), dtype=np.int32), np.zeros((1, 2, 3), dtype=np.int32),
+                    np.zeros((1, 3)), np.zeros((1, 3)))
+
+def _synchronized(method):
+    """Run a SignalProcessor method while holding the processor's lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class SignalProcessor:
     """
-    Signal processing class for noise filtering and smoothing
+    Signal processing class for noise filtering and smoothing.
+    The UI thread changes settings while the monitoring thread processes samples,
+    so public methods hold one (re-entrant) lock for their whole run.
     """
     
     def __init__(self):
+        self._lock = threading.RLock()
         self.filter_enabled = True
+        self.zero_phase = False  # Re-run filtfilt over the history instead of streaming (slower)
+        self.use_fixed_point = False  # Stream through the integer filter (for targets with a weak FPU)
         self.smoothing_window = 5
-        self.history_buffer = deque(maxlen=100)  # Keep last 100 readings for processing
+        # Ring of the last 100 (x, y, z) readings, only kept for zero-phase filtering
+        self._history = np.empty((100, 3))
+        self._history_head = 0
+        self._history_count = 0
+        self._history_offsets = np.arange(len(self._history))
+        self._zero_phase_zi = None  # Causal filter state used between zero-phase passes
+        self._samples_since_filtfilt = 0
         
         # Filter parameters
         self.filter_order = 4
@@ -18,85 +139,196 @@ class SignalProcessor:
         
         # Create butterworth low-pass filter
         self.b, self.a = signal.butter(self.filter_order, self.cutoff_frequency, btype='low')
+        # filtfilt pads by 3 * max(len(a), len(b)) samples and requires a longer input
+        self._min_filtfilt_samples = 3 * max(len(self.a), len(self.b)) + 1
+        
+        # The streaming filter runs as second-order sections, which stay stable at low cutoffs.
+        # Designed directly in SOS form rather than converted from (b, a), which loses precision.
+        self.sos = np.ascontiguousarray(
+            signal.butter(self.filter_order, self.cutoff_frequency, btype='low', output='sos'), dtype=np.float64
+        )
+        # Per-section state, shape (n_sections, 2, 3): the last axis is (x, y, z)
+        self._sos_state = np.zeros((self.sos.shape[0], 2, 3))
+        # Kernels specialized to these coefficients for the floating-point streaming path
+        self._filter_step, self._fused_step = _build_specialized_kernels(tuple(self.sos.ravel().tolist()))
+        self._filter_primed = False  # Whether the state has been seeded from a first sample
         
-        # Smoothing buffer for each axis
-        self.x_buffer = deque(maxlen=self.smoothing_window)
-        self.y_buffer = deque(maxlen=self.smoothing_window)
-        self.z_buffer = deque(maxlen=self.smoothing_window)
-        self.magnitude_buffer = deque(maxlen=self.smoothing_window)
+        # Quantized copy of the sections and state for the fixed-point filter
+        self._sos_q = np.round(self.sos * (1 << COEFF_SHIFT)).astype(np.int32)
+        self._sos_state_q = np.zeros(self._sos_state.shape, dtype=np.int32)
+        
+        self._sample = np.empty(3)  # Reused input/output buffers for per-sample processing
+        self._sample_block = self._sample.reshape(1, 3)  # (1, 3) view for the block kernels
+        self._filtered = np.empty(3)
+        self._smoothed = np.empty(3)
+        
+        # Smoothing ring buffer for the three axes
+        self._init_smoothing_rings()
+    
+    def _init_smoothing_rings(self, values=None):
+        """
+        (Re)allocate the (window, 3) smoothing ring buffer and its running sums,
+        optionally seeded with a chronological (n, 3) array of recent samples
+        """
+        window = self.smoothing_window
+        self._ring = np.zeros((window, 3))
+        self._ring_sums = np.zeros(3)
+        self._ring_pos = np.zeros(2, dtype=np.int64)  # (head, count)
+        
+        if values is not None and len(values):
+            values = values[-window:]
+            count = len(values)
+            self._ring[:count] = values
+            self._ring_pos[:] = (count % window, count)
+            self._ring_sums[:] = values.sum(axis=0)
+    
+    def _smoothing_history(self):
+        """Get the samples in the smoothing window as a chronological (n, 3) array"""
+        head, count = self._ring_pos.tolist()
+        order = (head - count + np.arange(count)) % self.smoothing_window
+        return self._ring[order]
+    
+    @_synchronized
+    def set_fixed_point(self, enabled):
+        """Switch the streaming filter between floating point and fixed point, carrying its state over"""
+        if enabled == self.use_fixed_point:
+            return
+        if enabled:
+            self._sos_state_q[:] = np.round(self._sos_state * SAMPLE_SCALE)
+        else:
+            self._sos_state[:] = self._sos_state_q / SAMPLE_SCALE
+        self.use_fixed_point = enabled
     
+    @_synchronized
     def set_filter_enabled(self, enabled):
         """Enable or disable noise filtering"""
         self.filter_enabled = enabled
     
+    @_synchronized
     def set_smoothing_window(self, window_size):
         """Set the smoothing window size"""
+        # Called on every UI rerun; only rebuild the buffers when the size actually changes
+        if window_size == self.smoothing_window:
+            return
+        
+        history = self._smoothing_history()
         self.smoothing_window = window_size
-        # Update buffer sizes
-        self.x_buffer = deque(list(self.x_buffer), maxlen=window_size)
-        self.y_buffer = deque(list(self.y_buffer), maxlen=window_size)
-        self.z_buffer = deque(list(self.z_buffer), maxlen=window_size)
-        self.magnitude_buffer = deque(list(self.magnitude_buffer), maxlen=window_size)
+        # Update buffer sizes, keeping the most recent samples
+        self._init_smoothing_rings(history)
     
+    @_synchronized
     def apply_noise_filter(self, data):
         """
-        Apply butterworth low-pass filter to remove high-frequency noise
+        Apply butterworth low-pass filter to remove high-frequency noise.
+        By default the filter is causal and streams one sample at a time, carrying
+        its state between calls; set zero_phase for the filtfilt path, which removes
+        the phase lag at the cost of re-filtering the whole history on every reading.
         """
         if not self.filter_enabled:
             return data
         
+        if self.zero_phase:
+            return self._apply_zero_phase_filter(data)
+        
+        sample = self._sample
+        sample[0] = data['x']
+        sample[1] = data['y']
+        sample[2] = data['z']
+        if not self._filter_primed:
+            self._init_filter_state(sample)
+        if self.use_fixed_point:
+            _biquad_fixed_block(self._sos_q, self._sos_state_q, self._sample_block, self._sample_block)
+            x, y, z = sample.tolist()
+        else:
+            self._filter_step(self._sos_state, sample, self._filtered)
+            x, y, z = self._filtered.tolist()
+        
+        return {
+            'timestamp': data['timestamp'],
+            'x': x,
+            'y': y,
+            'z': z,
+            'magnitude': math.sqrt(x*x + y*y + z*z)
+        }
+    
+    def _init_filter_state(self, xyz):
+        """Start the streaming filter from steady state at the given sample to avoid a startup transient"""
+        self._sos_state[:] = signal.sosfilt_zi(self.sos)[:, :, np.newaxis] * np.asarray(xyz)
+        self._sos_state_q[:] = np.round(self._sos_state * SAMPLE_SCALE)
+        self._filter_primed = True
+    
+    def _apply_zero_phase_filter(self, data):
+        """
+        Filter the reading forwards and backwards over the recent history (zero phase lag).
+        filtfilt only runs every FILTFILT_STRIDE readings; in between, a causal lfilter
+        step continues from the end of the last zero-phase result.
+        """
         # Add current data to history
-        self.history_buffer.append(data)
+        size = len(self._history)
+        self._history[self._history_head] = (data['x'], data['y'], data['z'])
+        self._history_head = (self._history_head + 1) % size
+        self._history_count = min(self._history_count + 1, size)
         
-        # Need at least filter_order + 1 points for filtering
-        if len(self.history_buffer) < self.filter_order + 1:
+        # filtfilt's edge padding needs more samples than its pad length
+        if self._history_count < self._min_filtfilt_samples:
             return data
         
-        # Extract recent data for filtering
-        recent_data = list(self.history_buffer)
-        
-        try:
-            # Apply filter to each axis
-            x_values = [d['x'] for d in recent_data]
-            y_values = [d['y'] for d in recent_data]
-            z_values = [d['z'] for d in recent_data]
-            
-            # Apply butterworth filter
-            x_filtered = signal.filtfilt(self.b, self.a, x_values)
-            y_filtered = signal.filtfilt(self.b, self.a, y_values)
-            z_filtered = signal.filtfilt(self.b, self.a, z_values)
-            
-            # Return the last (most recent) filtered values
-            filtered_data = {
+        self._samples_since_filtfilt += 1
+        if self._zero_phase_zi is not None and self._samples_since_filtfilt < FILTFILT_STRIDE:
+            sample = np.array([[data['x'], data['y'], data['z']]])
+            filtered, self._zero_phase_zi = signal.lfilter(
+                self.b, self.a, sample, axis=0, zi=self._zero_phase_zi
+            )
+            x, y, z = filtered[0].tolist()
+            return {
                 'timestamp': data['timestamp'],
-                'x': x_filtered[-1],
-                'y': y_filtered[-1],
-                'z': z_filtered[-1],
-                'magnitude': np.sqrt(x_filtered[-1]**2 + y_filtered[-1]**2 + z_filtered[-1]**2)
+                'x': x,
+                'y': y,
+                'z': z,
+                'magnitude': math.sqrt(x*x + y*y + z*z)
             }
-            
-            return filtered_data
-            
-        except Exception as e:
-            # If filtering fails, return original data
-            return data
+        
+        # Unroll the ring into chronological order; until it wraps it already is
+        if self._history_count < size:
+            recent = self._history[:self._history_count]
+        else:
+            recent = np.take(self._history, (self._history_head + self._history_offsets) % size, axis=0)
+        
+        # Apply butterworth filter to all three axes in one call
+        filtered = signal.filtfilt(self.b, self.a, recent, axis=0)
+        
+        # Reseed the causal filter so the readings until the next pass continue from this result
+        self._zero_phase_zi = np.column_stack([
+            signal.lfiltic(self.b, self.a, filtered[::-1, axis], recent[::-1, axis])
+            for axis in range(3)
+        ])
+        self._samples_since_filtfilt = 0
+        
+        # Return the last (most recent) filtered values
+        x, y, z = filtered[-1].tolist()
+        return {
+            'timestamp': data['timestamp'],
+            'x': x,
+            'y': y,
+            'z': z,
+            'magnitude': math.sqrt(x*x + y*y + z*z)
+        }
     
+    @_synchronized
     def apply_smoothing(self, data):
         """
         Apply moving average smoothing to the signal
         """
-        # Add to buffers
-        self.x_buffer.append(data['x'])
-        self.y_buffer.append(data['y'])
-        self.z_buffer.append(data['z'])
-        
-        # Calculate smoothed values
-        smoothed_x = np.mean(list(self.x_buffer))
-        smoothed_y = np.mean(list(self.y_buffer))
-        smoothed_z = np.mean(list(self.z_buffer))
+        # Push into the ring buffer and get the updated window means
+        sample = self._sample
+        sample[0] = data['x']
+        sample[1] = data['y']
+        sample[2] = data['z']
+        _update_ring(self._ring, self._ring_sums, self._ring_pos, sample, self._smoothed)
+        smoothed_x, smoothed_y, smoothed_z = self._smoothed.tolist()
         
         # Calculate smoothed magnitude
-        smoothed_magnitude = np.sqrt(smoothed_x**2 + smoothed_y**2 + smoothed_z**2)
+        smoothed_magnitude = math.sqrt(smoothed_x * smoothed_x + smoothed_y * smoothed_y + smoothed_z * smoothed_z)
         
         return {
             'timestamp': data['timestamp'],
@@ -106,12 +338,25 @@ class SignalProcessor:
             'magnitude': smoothed_magnitude
         }
     
+    @_synchronized
     def process_signal(self, raw_data):
         """
         Complete signal processing pipeline:
         1. Apply noise filtering
         2. Apply smoothing
+        In the default streaming mode both stages run in one compiled step,
+        building a single result dict per reading.
         """
+        if not self.zero_phase:
+            x, y, z, magnitude = self._process_step(raw_data['x'], raw_data['y'], raw_data['z'])
+            return {
+                'timestamp': raw_data['timestamp'],
+                'x': x,
+                'y': y,
+                'z': z,
+                'magnitude': magnitude
+            }
+        
         # Step 1: Apply noise filtering
         filtered_data = self.apply_noise_filter(raw_data)
         
@@ -120,19 +365,118 @@ class SignalProcessor:
         
         return processed_data
     
+    def _process_step(self, x, y, z):
+        """Filter and smooth one sample in the streaming mode, returning (x, y, z, magnitude)"""
+        sample = self._sample
+        sample[0] = x
+        sample[1] = y
+        sample[2] = z
+        filter_enabled = self.filter_enabled
+        if filter_enabled and not self._filter_primed:
+            self._init_filter_state(sample)
+        
+        smoothed = self._smoothed
+        if filter_enabled and not self.use_fixed_point:
+            magnitude = self._fused_step(
+                self._sos_state, self._ring, self._ring_sums, self._ring_pos, sample, smoothed
+            )
+            x, y, z = smoothed.tolist()
+            return x, y, z, magnitude
+        
+        if filter_enabled:
+            # Filter with the integer kernel, then smooth
+            _biquad_fixed_block(self._sos_q, self._sos_state_q, self._sample_block, self._sample_block)
+        _update_ring(self._ring, self._ring_sums, self._ring_pos, sample, smoothed)
+        x, y, z = smoothed.tolist()
+        return x, y, z, math.sqrt(x*x + y*y + z*z)
+    
+    @_synchronized
+    def process_signal_batch(self, xyz, timestamps=None):
+        """
+        Process an (N, 3) array of raw x, y, z samples in one vectorized pass:
+        causal low-pass filtering followed by moving-average smoothing.
+        Continues from (and updates) the same state as process_signal, and returns
+        a dict of arrays with the same keys.
+        In zero-phase mode the samples go through process_signal one at a time,
+        since that filter works on the reading history rather than a streaming state.
+        """
+        xyz = np.asarray(xyz, dtype=np.float64)
+        
+        if len(xyz) == 0:
+            # Nothing to process; leave the filter and smoothing state untouched
+            return {
+                'timestamp': timestamps,
+                'x': np.empty(0),
+                'y': np.empty(0),
+                'z': np.empty(0),
+                'magnitude': np.empty(0)
+            }
+        
+        if self.zero_phase and self.filter_enabled:
+            return self._process_zero_phase_batch(xyz, timestamps)
+        
+        if self.filter_enabled:
+            if not self._filter_primed:
+                self._init_filter_state(xyz[0])
+            if self.use_fixed_point:
+                xyz = xyz.copy()
+                _biquad_fixed_block(self._sos_q, self._sos_state_q, xyz, xyz)
+            else:
+                xyz, self._sos_state[:] = signal.sosfilt(self.sos, xyz, axis=0, zi=self._sos_state)
+        
+        # Trailing moving average that continues from the samples already in the smoothing ring
+        window = self.smoothing_window
+        previous = self._smoothing_history()
+        history = np.concatenate((previous, xyz))
+        smoothed = uniform_filter1d(history, window, axis=0, mode='nearest', origin=(window - 1) // 2)
+        # Windows that start before the first sample average only the samples seen so far
+        head = min(window - 1, len(history))
+        smoothed[:head] = np.cumsum(history[:head], axis=0) / np.arange(1, head + 1)[:, np.newaxis]
+        smoothed = smoothed[len(previous):]
+        
+        self._init_smoothing_rings(history)
+        
+        return {
+            'timestamp': timestamps,
+            'x': smoothed[:, 0],
+            'y': smoothed[:, 1],
+            'z': smoothed[:, 2],
+            'magnitude': np.sqrt(np.einsum('ij,ij->i', smoothed, smoothed))
+        }
+    
+    def _process_zero_phase_batch(self, xyz, timestamps):
+        """Run a batch through the per-sample zero-phase pipeline, collecting the results as arrays"""
+        results = np.empty((len(xyz), 4))
+        for i, (x, y, z) in enumerate(xyz.tolist()):
+            processed = self.process_signal({'timestamp': None, 'x': x, 'y': y, 'z': z})
+            results[i] = (processed['x'], processed['y'], processed['z'], processed['magnitude'])
+        
+        return {
+            'timestamp': timestamps,
+            'x': results[:, 0],
+            'y': results[:, 1],
+            'z': results[:, 2],
+            'magnitude': results[:, 3]
+        }
+    
+    @_synchronized
     def get_filter_status(self):
         """Get current filter configuration"""
         return {
             'filter_enabled': self.filter_enabled,
+            'zero_phase': self.zero_phase,
+            'use_fixed_point': self.use_fixed_point,
             'smoothing_window': self.smoothing_window,
             'cutoff_frequency': self.cutoff_frequency,
             'filter_order': self.filter_order
         }
     
+    @_synchronized
     def reset_buffers(self):
         """Clear all processing buffers"""
-        self.history_buffer.clear()
-        self.x_buffer.clear()
-        self.y_buffer.clear()
-        self.z_buffer.clear()
-        self.magnitude_buffer.clear()
+        self._history_head = 0
+        self._history_count = 0
+        self._zero_phase_zi = None
+        self._samples_since_filtfilt = 0
+        self._filter_primed = False
+        self._init_smoothing_rings()
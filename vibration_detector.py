@@ -1,13 +1,31 @@
+import math
 import numpy as np
-import random
 import time
 from datetime import datetime
 
+# Packed layout of one reading: epoch seconds, the three axes and the magnitude
+READING_DTYPE = np.dtype([('t', 'f8'), ('x', 'f8'), ('y', 'f8'), ('z', 'f8'), ('mag', 'f8')])
+
+# Number of readings covered by each block of pre-drawn random numbers
+RANDOM_BLOCK = 1024
+
+def ts_to_datetime(ts):
+    """Convert a reading timestamp (epoch seconds) to a local datetime for display and storage"""
+    return datetime.fromtimestamp(ts)
+
 class VibrationDetector:
     """
     Vibration detection class that simulates sensor readings and monitors thresholds
     """
     
+    # Angular frequencies (2*pi*f) of the simulated ambient and spike components
+    _TWO_PI_05 = 2 * math.pi * 0.5
+    _TWO_PI_03 = 2 * math.pi * 0.3
+    _TWO_PI_07 = 2 * math.pi * 0.7
+    _TWO_PI_10 = 2 * math.pi * 10
+    _TWO_PI_8 = 2 * math.pi * 8
+    _TWO_PI_12 = 2 * math.pi * 12
+    
     def __init__(self):
         self.threshold = 2.0
         self.sensitivity = "Medium"
@@ -21,6 +39,11 @@ class VibrationDetector:
             "Medium": 1.0,
             "High": 1.3
         }
+        self._sens = self.sensitivity_multipliers[self.sensitivity]  # Cached current multiplier
+        
+        # Random draws are generated in blocks and consumed one row per reading
+        self._rng = np.random.default_rng()
+        self._refill_draws()
     
     def set_threshold(self, threshold):
         """Set the vibration threshold for alerts"""
@@ -29,58 +52,85 @@ class VibrationDetector:
     def set_sensitivity(self, sensitivity):
         """Set the sensitivity level (Low, Medium, High)"""
         self.sensitivity = sensitivity
+        self._sens = self.sensitivity_multipliers[sensitivity]
     
     def get_vibration_reading(self):
         """
         Simulate vibration sensor reading with realistic patterns
-        Returns a dictionary with x, y, z components and magnitude
+        Returns a dictionary with x, y, z components and magnitude.
+        The timestamp is epoch seconds; use ts_to_datetime where a datetime is needed.
+        """
+        t, x, y, z, magnitude = self._simulate_reading()
+        
+        return {
+            'timestamp': t,
+            'x': x,
+            'y': y,
+            'z': z,
+            'magnitude': magnitude
+        }
+    
+    def sample_into(self, readings, index):
+        """
+        Simulate a reading straight into row index of a READING_DTYPE array,
+        without building a dictionary
         """
+        readings[index] = self._simulate_reading()
+    
+    def _refill_draws(self):
+        """
+        Draw the random numbers for the next RANDOM_BLOCK readings in one go.
+        Each row holds the x, y, z noise followed by three uniforms for the spike
+        check, spike magnitude and spike duration.
+        """
+        noise = self._rng.standard_normal((RANDOM_BLOCK, 3)) * (0.05, 0.05, 0.03)
+        uniforms = self._rng.random((RANDOM_BLOCK, 3))
+        self._draws = np.hstack((noise, uniforms)).tolist()  # Python floats index faster than NumPy scalars
+        self._draw_index = 0
+    
+    def _simulate_reading(self):
+        """Simulate one reading as a (t, x, y, z, magnitude) tuple of floats"""
         current_time = time.time()
         dt = current_time - self.last_reading_time
         self.last_reading_time = current_time
         
         # Generate base vibration with some realistic patterns
         t = current_time
+        if self._draw_index == RANDOM_BLOCK:
+            self._refill_draws()
+        noise_x, noise_y, noise_z, spike_draw, magnitude_draw, duration_draw = self._draws[self._draw_index]
+        self._draw_index += 1
         
         # Simulate different vibration sources
         # Normal ambient vibration
-        ambient_x = 0.1 * np.sin(2 * np.pi * 0.5 * t) + random.gauss(0, 0.05)
-        ambient_y = 0.1 * np.cos(2 * np.pi * 0.3 * t) + random.gauss(0, 0.05)
-        ambient_z = 0.05 * np.sin(2 * np.pi * 0.7 * t) + random.gauss(0, 0.03)
+        # (math on Python floats avoids NumPy's scalar dispatch overhead)
+        ambient_x = 0.1 * math.sin(self._TWO_PI_05 * t) + noise_x
+        ambient_y = 0.1 * math.cos(self._TWO_PI_03 * t) + noise_y
+        ambient_z = 0.05 * math.sin(self._TWO_PI_07 * t) + noise_z
         
         # Occasional spikes to simulate actual vibrations
         spike_probability = 0.05  # 5% chance of spike
-        if random.random() < spike_probability:
-            spike_magnitude = random.uniform(1.5, 4.0)
-            spike_duration = random.uniform(0.5, 2.0)
+        if spike_draw < spike_probability:
+            spike_magnitude = 1.5 + 2.5 * magnitude_draw  # Uniform in [1.5, 4.0)
+            spike_duration = 0.5 + 1.5 * duration_draw  # Uniform in [0.5, 2.0)
             
-            spike_x = spike_magnitude * np.sin(2 * np.pi * 10 * t) * np.exp(-t % spike_duration)
-            spike_y = spike_magnitude * np.cos(2 * np.pi * 8 * t) * np.exp(-t % spike_duration)
-            spike_z = spike_magnitude * np.sin(2 * np.pi * 12 * t) * np.exp(-t % spike_duration)
+            decay = spike_magnitude * math.exp(-t % spike_duration)
+            spike_x = decay * math.sin(self._TWO_PI_10 * t)
+            spike_y = decay * math.cos(self._TWO_PI_8 * t)
+            spike_z = decay * math.sin(self._TWO_PI_12 * t)
         else:
             spike_x = spike_y = spike_z = 0
         
-        # Combine ambient and spike vibrations
-        x = ambient_x + spike_x
-        y = ambient_y + spike_y
-        z = ambient_z + spike_z
-        
-        # Add sensitivity adjustment
-        sensitivity_factor = self.sensitivity_multipliers[self.sensitivity]
-        x *= sensitivity_factor
-        y *= sensitivity_factor
-        z *= sensitivity_factor
+        # Combine ambient and spike vibrations with sensitivity adjustment
+        sensitivity_factor = self._sens
+        x = (ambient_x + spike_x) * sensitivity_factor
+        y = (ambient_y + spike_y) * sensitivity_factor
+        z = (ambient_z + spike_z) * sensitivity_factor
         
         # Calculate magnitude
-        magnitude = np.sqrt(x**2 + y**2 + z**2)
+        magnitude = math.sqrt(x*x + y*y + z*z)
         
-        return {
-            'timestamp': datetime.now(),
-            'x': x,
-            'y': y,
-            'z': z,
-            'magnitude': magnitude
-        }
+        return current_time, x, y, z, magnitude
     
     def check_threshold(self, magnitude):
         """
@@ -89,6 +139,13 @@ class VibrationDetector:
         """
         return magnitude > self.threshold
     
+    def check_threshold_batch(self, magnitudes):
+        """
+        Check an array of vibration magnitudes against the threshold in one vectorized comparison
+        Returns a boolean array marking the samples that should trigger an alert
+        """
+        return np.asarray(magnitudes) > self.threshold
+    
     def get_status(self):
         """Get current detector status"""
         return {
@@ -0,0 +1,161 @@
+import numpy as np
+import itertools
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from vibration_detector import READING_DTYPE, ts_to_datetime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class VibrationMonitor:
+    """
+    Background monitoring loop that samples, processes and logs vibration data.
+    Runs on its own thread and never touches Streamlit session state; the UI
+    reads results back from the data logger and the alert history.
+    """
+    
+    def __init__(self, detector, processor, data_logger, batch_size=4, sample_interval=0.5):
+        self.detector = detector
+        self.processor = processor
+        self.data_logger = data_logger
+        self.batch_size = batch_size  # Samples processed and logged together (2s at 500ms sampling)
+        self.sample_interval = sample_interval  # Seconds between readings
+        self.config_id = None  # Configuration row referenced by logged entries
+        
+        # Alerts from the last alert_window, oldest first, shared with the UI thread
+        self.alert_window = timedelta(hours=1)
+        self.alert_history = deque()
+        self.total_alerts = 0
+        self._alert_lock = threading.Lock()
+        
+        self.max_consecutive_failures = 3  # Failed batches in a row before the loop gives up
+        
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    @property
+    def running(self):
+        """Whether the monitoring thread is active"""
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        """Start the monitoring thread if it isn't already running"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._monitoring_loop, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop the monitoring thread, letting it log the partial batch it holds"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def get_recent_alerts(self, limit=5):
+        """Get up to limit of the newest alerts, newest first"""
+        with self._alert_lock:
+            return list(itertools.islice(reversed(self.alert_history), limit))
+    
+    def count_recent_alerts(self):
+        """Count the alerts raised within alert_window"""
+        with self._alert_lock:
+            self._evict_expired_alerts()
+            return len(self.alert_history)
+    
+    def _evict_expired_alerts(self):
+        """Drop alerts older than alert_window (caller holds the lock)"""
+        cutoff = datetime.now() - self.alert_window
+        history = self.alert_history
+        while history and history[0]['timestamp'] < cutoff:
+            history.popleft()
+    
+    def clear_alerts(self):
+        """Clear the alert history"""
+        with self._alert_lock:
+            self.alert_history.clear()
+            self.total_alerts = 0
+    
+    def _monitoring_loop(self):
+        # Preallocated sample batch, processed and logged in one pass
+        readings = np.empty(self.batch_size, dtype=READING_DTYPE)
+        failures = 0
+        
+        while not self._stop_event.is_set():
+            # Generate vibration data
+            count = 0
+            while count < self.batch_size and not self._stop_event.is_set():
+                self.detector.sample_into(readings, count)
+                count += 1
+                self._stop_event.wait(self.sample_interval)  # Interruptible sleep
+            
+            if count == 0:
+                break
+            
+            try:
+                self._process_batch(readings[:count])
+                failures = 0
+            except Exception:
+                # Skip the batch but keep monitoring; a persistent error stops the thread,
+                # which the UI sees through the running property
+                failures += 1
+                logger.exception(f"Error processing monitoring batch ({failures} in a row)")
+                if failures >= self.max_consecutive_failures:
+                    logger.error("Monitoring stopped after repeated failures")
+                    break
+    
+    def _process_batch(self, readings):
+        """Process, threshold-check and log one batch of raw READING_DTYPE samples"""
+        detector = self.detector
+        timestamps = [ts_to_datetime(t) for t in readings['t'].tolist()]
+        
+        # Process signal
+        xyz = np.column_stack((readings['x'], readings['y'], readings['z']))
+        processed = self.processor.process_signal_batch(xyz, timestamps)
+        
+        # Check for alerts
+        alerts = detector.check_threshold_batch(processed['magnitude'])
+        
+        # Log data
+        log_entries = [
+            {
+                'timestamp': timestamp,
+                'raw_magnitude': raw,
+                'processed_magnitude': magnitude,
+                'x_axis': sx,
+                'y_axis': sy,
+                'z_axis': sz,
+                'alert': alert,
+                'config_id': self.config_id
+            }
+            for timestamp, raw, magnitude, sx, sy, sz, alert in zip(
+                timestamps,
+                readings['mag'].tolist(),
+                processed['magnitude'].tolist(),
+                processed['x'].tolist(),
+                processed['y'].tolist(),
+                processed['z'].tolist(),
+                alerts.tolist()
+            )
+        ]
+        
+        self.data_logger.add_entries(log_entries)
+        
+        # Handle alerts
+        new_alerts = [
+            {
+                'timestamp': entry['timestamp'],
+                'message': f"⚠️ Vibration Alert: {entry['processed_magnitude']:.2f} exceeds threshold {detector.threshold:.2f}",
+                'magnitude': entry['processed_magnitude']
+            }
+            for entry in log_entries if entry['alert']
+        ]
+        if new_alerts:
+            with self._alert_lock:
+                self.alert_history.extend(new_alerts)
+                self.total_alerts += len(new_alerts)
+                self._evict_expired_alerts()